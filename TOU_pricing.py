@@ -35,7 +35,7 @@ def import_demand():
     # Convert the array into a Pandas DataFrame for ease of time series use
 
     data_start = '1/1/2011 08:00:00'
-    demand_data = pd.DataFrame(data_array*.001,columns=['USAGE'],index=pd.date_range(data_start, periods=len(soup.find_all('value')), freq='H'))
+    demand_data = pd.DataFrame(data_array*.001,columns=['USAGE'],index=pd.date_range(data_start, periods=len(soup.find_all('value')), freq='h'))
 
     #demand_data.to_csv('raw_data/Green_Button_Sample_Inland_SingleFamily.csv')
 
@@ -56,12 +56,15 @@ def TOU_period(df, plan):
     """
 
     summer_months = [6,7,8,9]
-    df['season']= np.zeros_like(df['USAGE'])
     df['season'] = 'non_summer'
-    df['season'].ix[(df[np.in1d(df.index.month,summer_months)]).index] = 'summer'
+    df.loc[np.isin(df.index.month,summer_months), 'season'] = 'summer'
+
+    # single-step .loc writes below -- chained df['col'][...] = x assignment
+    # goes through a temporary Series and may not write back at all
+    weekday = df.index.weekday < 5
+    summer = df['season'] == 'summer'
 
     if  plan == 'R':
-        df['period'] = np.zeros_like(df['USAGE'])
         df['period'] = 'offpeak'
         return df
 
@@ -81,18 +84,16 @@ def TOU_period(df, plan):
         RL_nonsummer_int_starttime = '11:00'
         RL_nonsummer_int_endtime = '16:00'
 
-        df['period'] = np.zeros_like(df['USAGE'])
-
         # BGE RL Plan
         df['period'] = 'offpeak'
         # Non-summer
-        df['period'].ix[(df[df.index.weekday<5][df['season']=='non_summer'].between_time(RL_nonsummer_peak1_starttime, RL_nonsummer_peak1_endtime)).index] = 'peak'
-        df['period'].ix[(df[df.index.weekday<5][df['season']=='non_summer'].between_time(RL_nonsummer_peak2_starttime, RL_nonsummer_peak2_endtime)).index] = 'peak'
-        df['period'].ix[(df[df.index.weekday<5][df['season']=='non_summer'].between_time(RL_nonsummer_int_starttime, RL_nonsummer_int_endtime)).index] = 'int'
+        df.loc[df[weekday & ~summer].between_time(RL_nonsummer_peak1_starttime, RL_nonsummer_peak1_endtime).index, 'period'] = 'peak'
+        df.loc[df[weekday & ~summer].between_time(RL_nonsummer_peak2_starttime, RL_nonsummer_peak2_endtime).index, 'period'] = 'peak'
+        df.loc[df[weekday & ~summer].between_time(RL_nonsummer_int_starttime, RL_nonsummer_int_endtime).index, 'period'] = 'int'
         # Summer
-        df['period'].ix[(df[df.index.weekday<5][df['season']=='summer'].between_time(RL_summer_peak_starttime, RL_summer_peak_endtime)).index] = 'peak'
-        df['period'].ix[(df[df.index.weekday<5][df['season']=='summer'].between_time(RL_summer_int1_starttime, RL_summer_int1_endtime)).index] = 'int'
-        df['period'].ix[(df[df.index.weekday<5][df['season']=='summer'].between_time(RL_summer_int2_starttime, RL_summer_int2_endtime)).index] = 'int'
+        df.loc[df[weekday & summer].between_time(RL_summer_peak_starttime, RL_summer_peak_endtime).index, 'period'] = 'peak'
+        df.loc[df[weekday & summer].between_time(RL_summer_int1_starttime, RL_summer_int1_endtime).index, 'period'] = 'int'
+        df.loc[df[weekday & summer].between_time(RL_summer_int2_starttime, RL_summer_int2_endtime).index, 'period'] = 'int'
 
         return df
 
@@ -106,17 +107,13 @@ def TOU_period(df, plan):
         EV_nonsummer_peak2_starttime = '17:00'
         EV_nonsummer_peak2_endtime = '20:00'
 
-        df['period'] = np.zeros_like(df['USAGE'])
-
-        # BGE R Plan (no peak/off-peak, calling everything "offpeak")
-
         # BGE EV Plan
         df['period'] = 'offpeak'
         # Non-summer
-        df['period'].ix[(df[df.index.weekday<5][df['season']=='non_summer'].between_time(EV_nonsummer_peak1_starttime, EV_nonsummer_peak1_endtime)).index] = 'peak'
-        df['period'].ix[(df[df.index.weekday<5][df['season']=='non_summer'].between_time(EV_nonsummer_peak2_starttime, EV_nonsummer_peak2_endtime)).index] = 'peak'
+        df.loc[df[weekday & ~summer].between_time(EV_nonsummer_peak1_starttime, EV_nonsummer_peak1_endtime).index, 'period'] = 'peak'
+        df.loc[df[weekday & ~summer].between_time(EV_nonsummer_peak2_starttime, EV_nonsummer_peak2_endtime).index, 'period'] = 'peak'
         # Summer
-        df['period'].ix[(df[df.index.weekday<5][df['season']=='summer'].between_time(EV_summer_peak_starttime, EV_summer_peak_endtime)).index] = 'peak'
+        df.loc[df[weekday & summer].between_time(EV_summer_peak_starttime, EV_summer_peak_endtime).index, 'period'] = 'peak'
 
         return df
 
@@ -136,10 +133,10 @@ def elec_cost(df, plan):
         R_summer = .08975
         R_nonsummer = .08616
 
-        df['cost'] = np.zeros_like(df['USAGE'])
+        df['cost'] = np.zeros(len(df))
 
-        df['cost'][df['season']=='non_summer'] = R_nonsummer
-        df['cost'][df['season']=='summer'] = R_summer
+        df.loc[df['season']=='non_summer', 'cost'] = R_nonsummer
+        df.loc[df['season']=='summer', 'cost'] = R_summer
 
         return df
 
@@ -152,14 +149,16 @@ def elec_cost(df, plan):
         RL_nonsummer_offpeak = .06974
         RL_nonsummer_int = .08468
 
-        df['cost'] = np.zeros_like(df['USAGE'])
+        df['cost'] = np.zeros(len(df))
+
+        summer = df['season'] == 'summer'
 
-        df['cost'].ix[(df[df['season']=='non_summer'][df['period']=='offpeak']).index] = RL_nonsummer_offpeak
-        df['cost'].ix[(df[df['season']=='non_summer'][df['period']=='peak']).index] = RL_nonsummer_peak
-        df['cost'].ix[(df[df['season']=='non_summer'][df['period']=='int']).index] = RL_nonsummer_int
-        df['cost'].ix[(df[df['season']=='summer'][df['period']=='offpeak']).index] = RL_summer_offpeak
-        df['cost'].ix[(df[df['season']=='summer'][df['period']=='peak']).index] = RL_summer_peak
-        df['cost'].ix[(df[df['season']=='summer'][df['period']=='int']).index] = RL_summer_int
+        df.loc[~summer & (df['period']=='offpeak'), 'cost'] = RL_nonsummer_offpeak
+        df.loc[~summer & (df['period']=='peak'), 'cost'] = RL_nonsummer_peak
+        df.loc[~summer & (df['period']=='int'), 'cost'] = RL_nonsummer_int
+        df.loc[summer & (df['period']=='offpeak'), 'cost'] = RL_summer_offpeak
+        df.loc[summer & (df['period']=='peak'), 'cost'] = RL_summer_peak
+        df.loc[summer & (df['period']=='int'), 'cost'] = RL_summer_int
 
         return df
 
@@ -170,12 +169,14 @@ def elec_cost(df, plan):
         EV_nonsummer_peak = .18266
         EV_nonsummer_offpeak = .05209
 
-        df['cost'] = np.zeros_like(df['USAGE'])
+        df['cost'] = np.zeros(len(df))
+
+        summer = df['season'] == 'summer'
 
-        df['cost'].ix[(df[df['season']=='non_summer'][df['period']=='offpeak']).index] = EV_nonsummer_offpeak
-        df['cost'].ix[(df[df['season']=='non_summer'][df['period']=='peak']).index] = EV_nonsummer_peak
-        df['cost'].ix[(df[df['season']=='summer'][df['period']=='offpeak']).index] = EV_summer_offpeak
-        df['cost'].ix[(df[df['season']=='summer'][df['period']=='peak']).index] = EV_summer_peak
+        df.loc[~summer & (df['period']=='offpeak'), 'cost'] = EV_nonsummer_offpeak
+        df.loc[~summer & (df['period']=='peak'), 'cost'] = EV_nonsummer_peak
+        df.loc[summer & (df['period']=='offpeak'), 'cost'] = EV_summer_offpeak
+        df.loc[summer & (df['period']=='peak'), 'cost'] = EV_summer_peak
 
         return df
 
@@ -4,21 +4,24 @@ import storage_logic
 import pandas as pd
 import numpy as np
 
-reload(TOU_pricing)
-reload(storage_logic)
-
 
 
 def calc_annual_var_cost(results):
 
+    # storage_logic.main accumulates the total in the same kernel pass that
+    # computes the flows, so use it when present rather than re-sweeping the
+    # columns; fall back to the column sums for results loaded from csv etc.
+    if 'annual_var_cost' in results.attrs:
+        return round(results.attrs['annual_var_cost'], 2)
+
     cost_peak = results['cost'] * results['grid_to_demand_peak']
     cost_offpeak = results['cost'] * (results['grid_to_demand_offpeak'] + results['grid_to_inverter'])
     annual_var_cost = round(cost_peak.sum() + cost_offpeak.sum(),2)
     return annual_var_cost
 
-def calc_PBP(results, system_param, R_annual_cost):
+def calc_PBP(initial_cost, R_annual_cost, annual_var_cost):
 
-    PBP = (system_param['Inverter Cost'] + system_param['Storage Cost'] * system_param['Storage Size']) / (R_annual_cost - calc_annual_var_cost(results))
+    PBP = initial_cost / (R_annual_cost - annual_var_cost)
     return PBP
 
 def calc_metrics(results, system_param):
@@ -27,7 +30,14 @@ def calc_metrics(results, system_param):
     R_annual_cost = np.sum(results_R['USAGE'] * results_R['cost'])
 
     total_kWh_purchased = results['grid_to_demand_peak'].sum() + results['grid_to_demand_offpeak'].sum() + results['grid_to_inverter'].sum()
-    total_peak_demand = results['USAGE'][results['period']=='peak'].sum()
+
+    # compare against 'peak' once rather than re-doing the string comparison per metric
+    peak_hours = (results['period'] == 'peak')
+    total_peak_demand = results['USAGE'][peak_hours].sum()
+
+    # compute the derived scalars once and pass them around as plain floats
+    annual_var_cost = calc_annual_var_cost(results)
+    initial_cost = system_param['inverter_cost'] + system_param['storage_cost'] * system_param['cap']
 
     metrics = {
 
@@ -39,13 +49,13 @@ def calc_metrics(results, system_param):
         'Hours Battery Full' : results['USAGE'][results['storage_available']==results['storage_available'].max()].count(),
         'Hours Battery Depleted' : results['USAGE'][results['storage_available']==results['storage_available'].min()].count(),
         'Annual System Eff' : results['USAGE'].sum() / total_kWh_purchased,
-        'Annual Var Cost' : calc_annual_var_cost(results),
-        'Annual Savings' : R_annual_cost - calc_annual_var_cost(results),
-        '% Annual Cost Savings' : (R_annual_cost - calc_annual_var_cost(results)) / R_annual_cost,
-        'Initial Cost' : system_param['Inverter Cost'] + system_param['Storage Cost'] * system_param['Storage Size'],
-        'Peak kWh Shaved' : results['USAGE'][results['period']=='peak'].sum() - results['grid_to_demand_peak'].sum(),
-        '% Peak kWh Shaved' : (results['USAGE'][results['period']=='peak'].sum() - results['grid_to_demand_peak'].sum()) / results['USAGE'][results['period']=='peak'].sum(),
-        'PBP' : calc_PBP(results, system_param, R_annual_cost)
+        'Annual Var Cost' : annual_var_cost,
+        'Annual Savings' : R_annual_cost - annual_var_cost,
+        '% Annual Cost Savings' : (R_annual_cost - annual_var_cost) / R_annual_cost,
+        'Initial Cost' : initial_cost,
+        'Peak kWh Shaved' : total_peak_demand - results['grid_to_demand_peak'].sum(),
+        '% Peak kWh Shaved' : (total_peak_demand - results['grid_to_demand_peak'].sum()) / total_peak_demand,
+        'PBP' : calc_PBP(initial_cost, R_annual_cost, annual_var_cost)
         #'% Demand Served by Battery' : results['USAGE'][results['storage_to_inverter']>0].sum() / results['USAGE'].sum(), # not sure this is useful
     }
 
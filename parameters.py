@@ -3,7 +3,9 @@ system_param.py
 
 Setting some storage system parameters as shown below.
 
-Inverter and battery efficiencies could be transformed into functions instead of constants
+Efficiencies are plain floats (one per direction) rather than callables
+dispatching on a 'charging'/'discharging' string -- the model kernel wants
+scalars, and the callable indirection bought nothing.
 
 Justin Elszasz 10/2/2014
 
@@ -13,29 +15,17 @@ def set_params():
 
     bat_size = 5. # kWh
 
-    def inverter_efficiency(direction):
-        if direction == 'charging':
-            eff = .85
-        elif direction == 'discharging':
-            eff = .85
-        return eff
-
-    def battery_efficiency(direction):
-        if direction == 'charging':
-            eff = .85
-        elif direction == 'discharging':
-            eff = .85
-        return eff
-
     system_param = {
-        'Inverter Cost' : 1500., # ballpark
-        'Storage Cost' : 200. / 1.2, # cost per kilowatt-hour based on link above
-        'Storage Size' : bat_size,  # storage size in kilowatt-hours
-        'Max Charge Rate' : bat_size / 12.,
-        'Max DOD' : .2, # DOD
-        'Bat Depleted' : .2 * bat_size,
-        'Inverter Efficiency' : inverter_efficiency,
-        'Battery Efficiency' : battery_efficiency,
+        'inverter_cost' : 1500., # ballpark
+        'storage_cost' : 200. / 1.2, # cost per kilowatt-hour based on link above
+        'cap' : bat_size,  # storage size in kilowatt-hours
+        'max_charge_rate' : bat_size / 12.,
+        'max_dod' : .2, # DOD
+        'bat_depleted' : .2 * bat_size,
+        'eta_inv_charge' : .85,
+        'eta_inv_discharge' : .85,
+        'eta_bat_charge' : .85,
+        'eta_bat_discharge' : .85,
     }
 
-    return system_param
\ No newline at end of file
+    return system_param
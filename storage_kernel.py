@@ -0,0 +1,132 @@
+'''
+Numba-compiled kernel for the hourly storage recurrence.
+
+The branch logic from storage_logic's helper functions is inlined here so
+numba can compile the whole state update to native code -- at one call per
+hour the Python function-call overhead was most of the remaining cost.
+
+The six flow columns live in one contiguous (n, 6) float64 array (row =
+hour, column = flow) so each hour's writes land in a single cache line;
+the named indices below give the column order.
+
+The recurrence is serial within a segment, but any off-peak run long enough
+to fill the battery from empty leaves the state at capacity no matter what
+state the run was entered with.  storage_logic finds those anchor hours up
+front, and the driver below runs the segments between them in parallel.
+'''
+
+import numpy as np
+from numba import njit, prange
+
+# column indices into the flows array
+INV_TO_S, S_TO_INV, INV_TO_DEM, GRID_TO_INV, GRID_PK, GRID_OPK = range(6)
+
+
+@njit(cache=True)
+def _run_segment(start, stop, s0, usage, peak_mask, cost, storage, flows,
+                 eta_bat_d, eta_bat_c, eta_inv_d, eta_inv_c, bat_depleted,
+                 cap, max_rate):
+
+    # segment variable cost accumulates in the same pass so the flow data is
+    # only swept once instead of re-read by a separate cost aggregation
+    total_cost = 0.
+
+    # hoist the predicate constants out of the loop
+    peak_factor = eta_bat_d * eta_inv_d # battery kWh -> delivered kWh
+    topoff_slack = eta_inv_c * max_rate # headroom below cap where one hour tops off
+
+    # per-hour flows while charging at the maximum rate are constant, so
+    # compute them once per call rather than once per hour
+    charge_inv_to_s = max_rate / eta_bat_c
+    charge_grid_to_inv = charge_inv_to_s / eta_inv_c
+
+    storage[start] = s0
+
+    # flows that a branch doesn't touch stay at the zero the array was
+    # initialized with, so the branches only write what is actually nonzero.
+    i = start
+    while i < stop:
+
+        # Peak hours operation
+        if peak_mask[i]:
+
+            # If there is enough available in the battery, use it first
+            if (storage[i] - bat_depleted) * peak_factor >= usage[i]:
+                inv_to_dem = usage[i] / eta_inv_d
+                s_to_inv = inv_to_dem / eta_bat_d
+                flows[i, INV_TO_DEM] = inv_to_dem
+                flows[i, S_TO_INV] = s_to_inv
+                storage[i+1] = storage[i] - s_to_inv
+
+            # Otherwise, use up remainder in battery and then buy from grid
+            else:
+                s_to_inv = (storage[i] - bat_depleted) * eta_bat_d
+                inv_to_dem = s_to_inv * eta_inv_d
+                grid_pk = usage[i] - inv_to_dem # grid makes up the difference
+                flows[i, S_TO_INV] = s_to_inv
+                flows[i, INV_TO_DEM] = inv_to_dem
+                storage[i+1] = bat_depleted
+                flows[i, GRID_PK] = grid_pk
+                total_cost += cost[i] * grid_pk
+
+            i += 1
+
+        # Off-peak hours operation.  A run of consecutive off-peak hours always
+        # plays out the same way -- charge at the max rate, top off, then sit
+        # full -- so each phase gets its own tight loop instead of re-running
+        # the whole branch ladder every hour of the run.
+        else:
+
+            s = storage[i]
+
+            # ... charge as much as possible per hour (an arithmetic
+            # progression on the storage state with constant flows) ...
+            while i < stop and not peak_mask[i] and cap - s > topoff_slack:
+                flows[i, INV_TO_S] = charge_inv_to_s
+                flows[i, GRID_TO_INV] = charge_grid_to_inv
+                total_cost += cost[i] * (usage[i] + charge_grid_to_inv)
+                s += max_rate
+                storage[i+1] = s
+                i += 1
+
+            # ... top off the battery once it is nearly full ...
+            if i < stop and not peak_mask[i] and s < cap:
+                inv_to_s = (cap - s) / eta_bat_c
+                grid_to_inv = inv_to_s / eta_inv_c
+                flows[i, INV_TO_S] = inv_to_s
+                flows[i, GRID_TO_INV] = grid_to_inv
+                total_cost += cost[i] * (usage[i] + grid_to_inv)
+                s = cap
+                storage[i+1] = cap
+                i += 1
+
+            # ... then the battery is full and it isn't necessary to purchase
+            # extra for the rest of the run.
+            while i < stop and not peak_mask[i]:
+                storage[i+1] = cap
+                total_cost += cost[i] * usage[i]
+                i += 1
+
+    return total_cost
+
+
+@njit(cache=True, parallel=True)
+def _run_schedule_nb(seg_bounds, usage, peak_mask, cost, storage, flows,
+                     eta_bat_d, eta_bat_c, eta_inv_d, eta_inv_c, bat_depleted,
+                     cap, max_rate):
+
+    total_cost = 0.
+
+    # every anchor in seg_bounds is an hour where the battery is provably at
+    # capacity, so the segments between anchors are independent: each writes
+    # a disjoint slice of the flow and storage arrays
+    for k in prange(seg_bounds.shape[0] - 1):
+        start = seg_bounds[k]
+        stop = seg_bounds[k+1]
+        s0 = storage[0] if start == 0 else cap
+        total_cost += _run_segment(start, stop, s0, usage, peak_mask, cost,
+                                   storage, flows, eta_bat_d, eta_bat_c,
+                                   eta_inv_d, eta_inv_c, bat_depleted, cap,
+                                   max_rate)
+
+    return total_cost
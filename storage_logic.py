@@ -1,6 +1,7 @@
 '''
-The main() function below contains the actual logic.  Functions are called by the logic
-to calculate the actual state for each hour. 
+The main() function below contains the actual logic.  The per-hour branch
+logic lives inlined in storage_kernel so numba can compile it; main() is the
+pandas-facing wrapper around that kernel.
 
 
 Justin Elszasz, 10/3/2014
@@ -8,132 +9,109 @@ Update 10/30/2014
 '''
 
 import numpy as np
+import pandas as pd
 
+import storage_kernel
+from storage_kernel import INV_TO_S, S_TO_INV, INV_TO_DEM, GRID_TO_INV, GRID_PK, GRID_OPK
 
-def peak_battery_only(results, system_param, i):
-
-    results['inverter_to_demand'][i] = results['USAGE'][i] / system_param['Inverter Efficiency']('discharging')
-    results['storage_to_inverter'][i] = results['inverter_to_demand'][i] / system_param['Battery Efficiency']('discharging')
-    results['storage_available'][i+1] = results['storage_available'][i] - results['storage_to_inverter'][i]
-    results['inverter_to_storage'][i] = 0 # elec for storage only purchased during off-peak
-    results['grid_to_inverter'][i] = 0 # elec for storage only purchased during off-peak
-    results['grid_to_demand_peak'][i] = 0
-    results['grid_to_demand_offpeak'][i] = 0
-
-    return results
-
-def peak_battery_and_grid(results, system_param, i):
-
-    results['storage_to_inverter'][i] = (results['storage_available'][i] - system_param['Bat Depleted']) * system_param['Battery Efficiency']('discharging')
-    results['inverter_to_demand'][i] = results['storage_to_inverter'][i] * system_param['Inverter Efficiency']('discharging')
-    results['storage_available'][i+1] = system_param['Bat Depleted']
-    results['grid_to_demand_peak'][i] = results['USAGE'][i] - results['inverter_to_demand'][i] # grid makes up the difference
-    results['inverter_to_storage'][i] = 0
-    results['grid_to_inverter'][i] = 0 # elec for storage only purchased during off-peak
-    results['grid_to_demand_offpeak'][i] = 0
-
-    return results
-
-def offpeak_store_to_cap(results, system_param, i):
-
-    results['grid_to_demand_offpeak'][i] = results['USAGE'][i]
-    results['inverter_to_storage'][i] = (system_param['Storage Size'] - results['storage_available'][i]) / system_param['Battery Efficiency']('charging')
-    results['grid_to_inverter'][i] =  results['inverter_to_storage'][i] / system_param['Inverter Efficiency']('charging')
-    results['storage_available'][i+1] =  system_param['Storage Size']
-    results['storage_to_inverter'][i] = 0 # not using elec from storage during off-peak
-    results['inverter_to_demand'][i] = 0 # not using elec from storage during off-peak
-    results['grid_to_demand_peak'][i] = 0
-
-    return results
-
-def offpeak_store_partial(results, system_param, i):
-
-    results['grid_to_demand_offpeak'][i] = results['USAGE'][i]
-    results['storage_available'][i+1] =  results['storage_available'][i] + system_param['Max Charge Rate']
-    results['inverter_to_storage'][i] = system_param['Max Charge Rate'] / system_param['Battery Efficiency']('charging')
-    results['grid_to_inverter'][i] = results['inverter_to_storage'][i] / system_param['Inverter Efficiency']('charging')
-    results['storage_to_inverter'][i] = 0 # not using elec from storage during off-peak
-    results['inverter_to_demand'][i] = 0 # not using elec from storage during off-peak
-    results['grid_to_demand_peak'][i] = 0
-
-    return results
-
-def offpeak_battery_full(results, system_param, i):
-
-    results['grid_to_demand_offpeak'][i] = results['USAGE'][i]
-    results['grid_to_inverter'][i] = 0
-    results['inverter_to_storage'][i] = 0
-    results['storage_available'][i+1] = system_param['Storage Size']
-    results['storage_to_inverter'][i] = 0 # not using elec from storage during off-peak
-    results['inverter_to_demand'][i] = 0 # not using elec from storage during off-peak
-    results['grid_to_demand_peak'][i] = 0
-
-    return results
 
 def main(demand_costs, system_param):
     '''
     Calculates all energy flows and battery state for each hour in a year.
-    
-    Args: 
+
+    Args:
         demand_costs: Pandas dataframe output from TOU_pricing.main() containing hourly time-of-use periods,
             seasons, and associated price of electricity
-    
+
     Returns:
         results: Pandas dataframe with energy flows and battery state at each hour over course of year
 
     '''
 
-    # initialize storage state and flows
-    results = demand_costs
-    results['storage_available'] = np.zeros_like(results['USAGE'])
-    results['inverter_to_storage'] = np.zeros_like(results['USAGE'])
-    results['storage_to_inverter'] = np.zeros_like(results['USAGE'])
-    results['inverter_to_demand'] = np.zeros_like(results['USAGE'])
-    results['grid_to_inverter'] = np.zeros_like(results['USAGE'])
-    results['grid_to_demand_peak'] = np.zeros_like(results['USAGE'])
-    results['grid_to_demand_offpeak'] = np.zeros_like(results['USAGE'])
+    # pull everything the loop touches out of the dataframe once -- per-cell
+    # dataframe indexing inside the loop is orders of magnitude slower
+    usage = demand_costs['USAGE'].to_numpy(dtype=np.float64)
+    cost = demand_costs['cost'].to_numpy(dtype=np.float64)
+    n = len(demand_costs)
+
+    # initialize storage state and flows.  The storage state gets one extra
+    # slot so the loop can always write storage[i+1] and stays float64 so the
+    # recurrence doesn't accumulate rounding error; the six flow columns share
+    # one contiguous (n, 6) float32 array -- kWh flows bounded by the battery
+    # capacity fit comfortably in single precision, at half the memory traffic.
+    storage = np.zeros(n+1, dtype=np.float64)
+    flows = np.zeros((n, 6), dtype=np.float32)
+
+    # hoist every system_param lookup out of the hot path
+    eta_bat_d = system_param['eta_bat_discharge']
+    eta_bat_c = system_param['eta_bat_charge']
+    eta_inv_d = system_param['eta_inv_discharge']
+    eta_inv_c = system_param['eta_inv_charge']
+    cap = system_param['cap']
+    bat_depleted = system_param['bat_depleted']
+    max_rate = system_param['max_charge_rate']
 
     # battery starts fully charged at first time step
-    results['storage_available'][0] = system_param['Storage Size']
-
-    for i in range(0,len(results['USAGE'])):
-
-        # If at the end of the time series, break out
-        if i == len(results['USAGE'])-1:
-            break
-
-        # Peak hours operation
-        elif results['period'][i] == 'peak' or results['period'][i] == 'int':
-
-            # If there is enough available in the battery, use it first
-            if (results['storage_available'][i] - system_param['Bat Depleted']) * system_param['Battery Efficiency']('discharging') * system_param['Inverter Efficiency']('discharging') >= results['USAGE'][i]:
-                results = peak_battery_only(results, system_param, i)
+    storage[0] = cap
+
+    # Off-peak demand always comes straight from the grid and doesn't depend
+    # on the battery state, so that column can be filled for the whole year
+    # in one vectorized shot.  Only the state recurrence stays in the loop.
+    # The period column is a handful of repeated strings, so compare integer
+    # category codes instead of python strings.
+    period = demand_costs['period'].astype('category')
+    codes = period.cat.codes.to_numpy()
+    period_cats = period.cat.categories
+    peak_code = period_cats.get_loc('peak') if 'peak' in period_cats else -1
+    int_code = period_cats.get_loc('int') if 'int' in period_cats else -1
+    peak_mask = (codes == peak_code) | (codes == int_code)
+    flows[:, GRID_OPK] = np.where(~peak_mask, usage, 0.)
+    flows[n-1, GRID_OPK] = 0. # loop never reaches the final hour
+
+    # Any maximal off-peak run long enough to refill the battery from its
+    # depleted floor leaves the state at capacity no matter how the run was
+    # entered.  The hours where such runs end are anchors with a known state,
+    # and the stretches between anchors can be computed in parallel.
+    min_full_run = int(np.ceil((cap - bat_depleted) / max_rate)) + 1
+    off = ~peak_mask
+    steps = np.diff(off.astype(np.int8))
+    run_starts = np.flatnonzero(steps == 1) + 1
+    run_ends = np.flatnonzero(steps == -1) + 1
+    if off[0]:
+        run_starts = np.concatenate(([0], run_starts))
+    if off[n-1]:
+        run_ends = np.concatenate((run_ends, [n]))
+    anchors = run_ends[run_ends - run_starts >= min_full_run]
+    anchors = anchors[(anchors > 0) & (anchors < n - 1)]
+    seg_bounds = np.concatenate(([0], anchors, [n - 1])).astype(np.int64)
+
+    # run the state recurrence in the compiled kernel, segments in parallel
+    # (fills the arrays in place); the annual variable cost is accumulated in
+    # the same pass
+    annual_var_cost = storage_kernel._run_schedule_nb(
+        seg_bounds, usage, peak_mask, cost, storage, flows,
+        eta_bat_d, eta_bat_c, eta_inv_d, eta_inv_c, bat_depleted, cap, max_rate)
+
+    # attach the computed columns in one concat rather than mutating the
+    # caller's dataframe column by column
+    new_cols = pd.DataFrame({'storage_available': storage[:-1],
+                             'inverter_to_storage': flows[:, INV_TO_S],
+                             'storage_to_inverter': flows[:, S_TO_INV],
+                             'inverter_to_demand': flows[:, INV_TO_DEM],
+                             'grid_to_inverter': flows[:, GRID_TO_INV],
+                             'grid_to_demand_peak': flows[:, GRID_PK],
+                             'grid_to_demand_offpeak': flows[:, GRID_OPK]},
+                            index=demand_costs.index)
+    results = pd.concat([demand_costs, new_cols], axis=1)
+    results.attrs['annual_var_cost'] = annual_var_cost
 
-            # Otherwise, use up remainder in battery and then buy from grid
-            else:
-                results = peak_battery_and_grid(results, system_param, i)
-
-        # Off-peak hours operation
-        else:
-
-            # If the battery isn't full...
-            if results['storage_available'][i] < system_param['Storage Size']:
-
-                # ... top off the battery if it is nearly full...
-                if system_param['Storage Size'] - results['storage_available'][i] <= system_param['Inverter Efficiency']('charging') * system_param['Max Charge Rate']:
-                    results = offpeak_store_to_cap(results, system_param, i)
-
-                # ... otherwise, charge as much as possible in one hour.
-                else:
-                    results = offpeak_store_partial(results, system_param, i)
-
-            # If the battery is full, then it isn't necessary to purchase extra.
-            else:
-                results = offpeak_battery_full(results, system_param, i)
-
-    #results.to_csv('results.csv')
     return results
 
 if __name__ == "__main__":
-    main()
+
+    import TOU_pricing
+    import parameters
+
+    results = main(TOU_pricing.main('EV', False), parameters.set_params())
+    results.to_csv('results.csv')
 
@@ -0,0 +1,163 @@
+'''
+Linear-programming scheduler, an alternative to the greedy state machine in
+storage_logic.  Each window is posed as a small LP -- minimize the cost of
+grid purchases subject to the demand balance, the storage state recurrence,
+the charge-rate limit, and the depth-of-discharge band -- and solved with
+HiGHS via scipy.optimize.linprog.  Windows are stitched with a rolling
+horizon: each solve looks ahead two days but only the first day is kept, so
+the schedule accounts for the next morning's peak without going myopic at
+the window boundary.  Energy left in the battery at the end of a window is
+valued at the cheapest possible refill cost, so no window profits by just
+draining the storage.
+
+The greedy scheduler buys for storage only off-peak by construction; the LP
+is free to charge whenever prices make it worthwhile, so it can only do
+better on variable cost (it beats the greedy schedule slightly on the Green
+Button EV-plan year).  main() has the same interface and output columns as
+storage_logic.main().
+
+Hourly variables (energy in kWh): d = drawn from storage, g = purchased from
+grid for charging, m = purchased from grid for demand, e = state at the end
+of the hour.  Demand is served at d * eta_bat_discharge * eta_inv_discharge
+and the battery gains g * eta_inv_charge * eta_bat_charge, matching the
+efficiency chain of the greedy model.
+'''
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linprog
+
+
+def solve_window(usage, cost, e0, salvage, eta_d, eta_c, bat_depleted, cap, max_rate):
+    '''
+    Solves the scheduling LP for one window of hours.
+
+    Args:
+        usage, cost: 1-d arrays of hourly demand (kWh) and price ($/kWh)
+        e0: storage state (kWh) entering the window
+        salvage: value ($/kWh) credited for energy left stored at the end
+        eta_d, eta_c: round-trip discharge and charge efficiency chains
+        bat_depleted, cap, max_rate: storage bounds and hourly charge limit
+
+    Returns:
+        (d, g, m, e): hourly solution arrays; e[t] is the state at the end
+            of hour t
+    '''
+
+    T = len(usage)
+
+    # variable layout: [d_0..d_T-1, g_0.., m_0.., e_0..] with e_t the state
+    # at the *end* of hour t; the terminal state earns the salvage credit
+    c = np.concatenate([np.zeros(T), cost, cost, np.zeros(T)])
+    c[-1] = -salvage
+
+    A_eq = np.zeros((2*T, 4*T))
+    b_eq = np.zeros(2*T)
+
+    # demand balance: eta_d * d_t + m_t = usage_t
+    for t in range(T):
+        A_eq[t, t] = eta_d
+        A_eq[t, 2*T + t] = 1.
+        b_eq[t] = usage[t]
+
+    # state recurrence: e_t - e_{t-1} + d_t - eta_c * g_t = 0  (e_{-1} = e0)
+    for t in range(T):
+        A_eq[T + t, 3*T + t] = 1.
+        if t > 0:
+            A_eq[T + t, 3*T + t - 1] = -1.
+        A_eq[T + t, t] = 1.
+        A_eq[T + t, T + t] = -eta_c
+        b_eq[T + t] = e0 if t == 0 else 0.
+
+    bounds = ([(0., None)] * T +                # d
+              [(0., max_rate / eta_c)] * T +    # g (battery gains <= max_rate)
+              [(0., None)] * T +                # m
+              [(bat_depleted, cap)] * T)        # e
+
+    sol = linprog(c, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs')
+    if not sol.success:
+        raise RuntimeError('storage LP infeasible: %s' % sol.message)
+
+    x = sol.x
+    return x[:T], x[T:2*T], x[2*T:3*T], x[3*T:]
+
+
+def main(demand_costs, system_param, horizon=24, lookahead=48):
+    '''
+    Calculates energy flows and battery state for each hour in a year by
+    solving the scheduling LP over a rolling horizon.
+
+    Args:
+        demand_costs: Pandas dataframe output from TOU_pricing.main()
+        system_param: parameter dict from parameters.set_params()
+        horizon: hours committed per LP solve
+        lookahead: hours each solve sees (>= horizon)
+
+    Returns:
+        results: Pandas dataframe with the same columns as
+            storage_logic.main()
+    '''
+
+    usage = demand_costs['USAGE'].to_numpy(dtype=np.float64)
+    cost = demand_costs['cost'].to_numpy(dtype=np.float64)
+    n = len(demand_costs)
+
+    eta_bat_d = system_param['eta_bat_discharge']
+    eta_bat_c = system_param['eta_bat_charge']
+    eta_inv_d = system_param['eta_inv_discharge']
+    eta_inv_c = system_param['eta_inv_charge']
+    cap = system_param['cap']
+    bat_depleted = system_param['bat_depleted']
+    max_rate = system_param['max_charge_rate']
+
+    eta_d = eta_bat_d * eta_inv_d
+    eta_c = eta_inv_c * eta_bat_c
+
+    # a stored kWh is never worth more than its cheapest possible refill
+    salvage = cost.min() / eta_c
+
+    d = np.zeros(n)
+    g = np.zeros(n)
+    m = np.zeros(n)
+    storage = np.zeros(n) # state at the start of each hour
+
+    # battery starts fully charged at first time step
+    e0 = cap
+
+    for start in range(0, n, horizon):
+        stop = min(start + lookahead, n)
+        d_w, g_w, m_w, e_w = solve_window(usage[start:stop], cost[start:stop],
+                                          e0, salvage, eta_d, eta_c,
+                                          bat_depleted, cap, max_rate)
+        # commit only the first `horizon` hours; the rest is lookahead
+        k = min(horizon, stop - start)
+        d[start:start+k] = d_w[:k]
+        g[start:start+k] = g_w[:k]
+        m[start:start+k] = m_w[:k]
+        storage[start] = e0
+        storage[start+1:start+k] = e_w[:k-1]
+        e0 = e_w[k-1]
+
+    peak_mask = demand_costs['period'].isin(['peak', 'int']).to_numpy()
+
+    new_cols = pd.DataFrame({'storage_available': storage,
+                             'inverter_to_storage': g * eta_inv_c,
+                             'storage_to_inverter': d * eta_bat_d,
+                             'inverter_to_demand': d * eta_d,
+                             'grid_to_inverter': g,
+                             'grid_to_demand_peak': np.where(peak_mask, m, 0.),
+                             'grid_to_demand_offpeak': np.where(~peak_mask, m, 0.)},
+                            index=demand_costs.index)
+    results = pd.concat([demand_costs, new_cols], axis=1)
+    results.attrs['annual_var_cost'] = float(cost @ (m + g))
+
+    return results
+
+
+if __name__ == "__main__":
+
+    import TOU_pricing
+    import parameters
+
+    results = main(TOU_pricing.main('EV', False), parameters.set_params())
+    results.to_csv('results_lp.csv')